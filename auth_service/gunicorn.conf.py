@@ -0,0 +1,14 @@
+"""
+Gunicorn Settings - Auth Service
+Each worker warms up (token signing, MongoDB connection) before it accepts requests
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+
+def post_worker_init(worker):
+    # Runs in the worker after the app is imported and before its first request
+    from app import warm_up
+    warm_up()
@@ -0,0 +1,95 @@
+"""
+JSON Benchmark - Serializing large expense lists the old way vs. MongoJSONProvider
+
+The old path stringifies every '_id' and then goes through Flask's stdlib
+encoder; the new path hands the raw documents to the JSON provider.
+
+Usage:
+    python benchmarks/bench_json.py --expenses 10000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'budget_service'))
+
+from bson import ObjectId  # noqa: E402
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+from json_provider import MongoJSONProvider  # noqa: E402
+
+CATEGORIES = ['Food', 'Transportation', 'Entertainment', 'Shopping', 'Bills', 'Other']
+
+
+def make_expenses(count):
+    """Documents shaped like daily_expenses as returned by pymongo"""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    return [{
+        '_id': ObjectId(),
+        'user_id': 1669653170,
+        'description': f'expense {i}',
+        'category': rng.choice(CATEGORIES),
+        'amount': round(rng.uniform(1, 200), 2),
+        'date': (start + timedelta(days=i % 365)).strftime('%Y-%m-%d'),
+        'created_at': (start + timedelta(minutes=i)).isoformat(),
+        'change_seq': i + 1
+    } for i in range(count)]
+
+
+def measure(label, operation, repeat, setup=lambda: None):
+    """Time operation(setup()) repeat times; setup is excluded from the timing"""
+    samples = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        operation(argument)
+        samples.append((time.perf_counter() - start) * 1000)
+    median = statistics.median(samples)
+    print(f"  {label:<36} median {median:9.2f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--expenses', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    documents = make_expenses(args.expenses)
+
+    old_app = Flask('old')
+    old_app.json = DefaultJSONProvider(old_app)
+    new_app = Flask('new')
+    new_app.json = MongoJSONProvider(new_app)
+
+    def fresh_documents():
+        return [dict(document) for document in documents]
+
+    def old_path(expenses):
+        # Convert ObjectId to string for JSON serialization
+        for expense in expenses:
+            expense['_id'] = str(expense['_id'])
+        with old_app.app_context():
+            old_app.json.response(expenses)
+
+    def new_path(expenses):
+        with new_app.app_context():
+            new_app.json.response(expenses)
+
+    print(f"\nSerializing {args.expenses} expenses "
+          f"({'orjson' if json_provider.orjson else 'stdlib json'} provider)")
+    baseline = measure('str(_id) pass + stdlib jsonify', old_path, args.repeat, fresh_documents)
+    current = measure('MongoJSONProvider', new_path, args.repeat, fresh_documents)
+    print(f"  speedup: {baseline / current:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Storage Benchmark - Compares repository backends on the budget service's hot paths
+
+Usage:
+    python benchmarks/bench_storage.py                          # SQLite only
+    python benchmarks/bench_storage.py --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'budget_service'))
+
+from storage import MongoRepository, SQLiteRepository  # noqa: E402
+
+CATEGORIES = ['Food', 'Transportation', 'Entertainment', 'Shopping', 'Bills', 'Other']
+WORDS = ['coffee', 'groceries', 'bus', 'cinema', 'rent', 'lunch', 'taxi', 'books', 'gym', 'dinner']
+
+
+def seed(repository, users, expenses_per_user):
+    """Insert the same pseudo-random data set into a repository"""
+    rng = random.Random(42)
+    for user_id in range(1, users + 1):
+        for month in range(1, 13):
+            repository.create_budget(user_id, {
+                'category': rng.choice(CATEGORIES),
+                'amount': float(rng.randint(100, 1000)),
+                'month': f'2024-{month:02d}'
+            })
+        for _ in range(expenses_per_user):
+            repository.create_expense(user_id, {
+                'description': ' '.join(rng.sample(WORDS, 2)),
+                'category': rng.choice(CATEGORIES),
+                'amount': round(rng.uniform(1, 200), 2),
+                'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+            })
+
+
+def measure(label, operation, repeat):
+    """Run operation repeat times and print latency percentiles in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+    print(f"  {label:<28} median {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def run(name, repository, users, expenses_per_user, repeat):
+    print(f"\n{name}")
+    repository.ensure_indexes()
+    start = time.perf_counter()
+    seed(repository, users, expenses_per_user)
+    elapsed = time.perf_counter() - start
+    writes = users * (expenses_per_user + 12)
+    print(f"  seeded {writes} rows in {elapsed:.2f} s ({writes / elapsed:,.0f} writes/s)")
+
+    rng = random.Random(7)
+    user = lambda: rng.randint(1, users)  # noqa: E731
+    measure('list budgets', lambda: repository.list_budgets(user()), repeat)
+    measure('list expenses', lambda: repository.list_expenses(user()), repeat)
+    measure('expenses for one month', lambda: repository.list_expenses(
+        user(), {'date_from': '2024-06-01', 'date_to': '2024-06-31'}), repeat)
+    measure('expenses by category', lambda: repository.list_expenses(
+        user(), {'categories': ['Food']}), repeat)
+    measure('text search', lambda: repository.list_expenses(
+        user(), {'search': 'coffee'}), repeat)
+    measure('delta sync (nothing new)', lambda: repository.changes_since(
+        user(), expenses_per_user + 12), repeat)
+    measure('create expense', lambda: repository.create_expense(user(), {
+        'description': 'benchmark', 'category': 'Other', 'amount': 1.0, 'date': '2024-12-31'
+    }), repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--expenses-per-user', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--mongo-uri', help='also benchmark MongoDB (uses the budget_planner_bench database)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run('SQLite', SQLiteRepository(os.path.join(tmp, 'bench.db')),
+            args.users, args.expenses_per_user, args.repeat)
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+        client.drop_database('budget_planner_bench')
+        try:
+            run('MongoDB', MongoRepository(client.budget_planner_bench),
+                args.users, args.expenses_per_user, args.repeat)
+        finally:
+            client.drop_database('budget_planner_bench')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Admission Control - Adaptive concurrency limit with priority classes
+Sheds excess requests early (503 + Retry-After) instead of letting every route degrade together
+"""
+
+import math
+import threading
+import time
+
+# Share of the current limit each priority class may occupy. When the service is
+# saturated, lower classes are shed first and higher classes keep some headroom.
+PRIORITY_SHARES = {
+    'critical': 1.0,
+    'normal': 0.8,
+    'low': 0.5,
+}
+
+
+class AdaptiveLimiter:
+    """Latency-based concurrency limit (a simplified gradient algorithm).
+
+    A fast and a slow moving average of request latency are compared; when
+    the fast one rises above the slow one by more than `tolerance`, the limit
+    shrinks, otherwise it grows by roughly sqrt(limit). The limit only grows
+    while the service is actually using at least half of it.
+
+    `capacity`, if given, returns how many requests can run concurrently right
+    now (e.g. worker threads not held by event streams); requests are never
+    admitted beyond it, whatever the latency-based limit says.
+    """
+
+    # Floor for latency samples; a coarse clock can measure a fast request as 0
+    MIN_LATENCY = 1e-6
+
+    def __init__(self, initial_limit=16, min_limit=2, max_limit=64, tolerance=1.5, smoothing=0.2,
+                 capacity=None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._capacity = capacity
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._short_rtt = None
+        self._long_rtt = None
+        self._accepted = {priority: 0 for priority in PRIORITY_SHARES}
+        self._rejected = {priority: 0 for priority in PRIORITY_SHARES}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, priority):
+        """Admit a request of the given priority, or return False to shed it"""
+        capacity = self._capacity() if self._capacity else None
+        with self._lock:
+            class_limit = max(1, int(self._limit * PRIORITY_SHARES[priority]))
+            if capacity is not None:
+                class_limit = min(class_limit, capacity)
+            if self._in_flight >= class_limit:
+                self._rejected[priority] += 1
+                return False
+            self._in_flight += 1
+            self._accepted[priority] += 1
+            return True
+
+    def release(self, latency):
+        """Record an admitted request's latency (seconds) and adjust the limit"""
+        latency = max(latency, self.MIN_LATENCY)
+        with self._lock:
+            in_flight = self._in_flight
+            self._in_flight -= 1
+            if self._short_rtt is None:
+                self._short_rtt = self._long_rtt = latency
+                return
+            self._short_rtt += (latency - self._short_rtt) * 0.1
+            self._long_rtt += (latency - self._long_rtt) * 0.01
+            # After a sustained change in latency, let the baseline catch up quickly
+            if self._long_rtt / self._short_rtt > 2:
+                self._long_rtt *= 0.95
+
+            gradient = max(0.5, min(1.0, self.tolerance * self._long_rtt / self._short_rtt))
+            new_limit = self._limit * gradient + math.sqrt(self._limit)
+            new_limit = self._limit * (1 - self.smoothing) + new_limit * self.smoothing
+            # Don't grow the limit while most of it is unused
+            if new_limit > self._limit and in_flight < self._limit / 2:
+                return
+            self._limit = max(self.min_limit, min(self.max_limit, new_limit))
+
+    def snapshot(self):
+        """Limiter state for monitoring"""
+        with self._lock:
+            return {
+                'limit': round(self._limit, 2),
+                'in_flight': self._in_flight,
+                'short_latency_ms': round(self._short_rtt * 1000, 2) if self._short_rtt else None,
+                'long_latency_ms': round(self._long_rtt * 1000, 2) if self._long_rtt else None,
+                'class_limits': {priority: max(1, int(self._limit * share))
+                                 for priority, share in PRIORITY_SHARES.items()},
+                'accepted': dict(self._accepted),
+                'rejected': dict(self._rejected),
+                'timestamp': time.time()
+            }
@@ -0,0 +1,195 @@
+"""
+Change Feed - Fans out one MongoDB change stream per process to SSE clients
+Each connected client gets a bounded queue of events for its own user_id
+"""
+
+import queue
+import threading
+import time
+import logging
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Server error codes that mean change streams cannot be used at all
+CHANGE_STREAMS_UNSUPPORTED = {
+    40573,  # $changeStream is only supported on replica sets
+    40324,  # unrecognized pipeline stage (very old servers)
+}
+# The resume token has fallen off the oplog; resuming is impossible
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class Subscription:
+    """Events for one connected client, bounded so a slow client can't exhaust memory"""
+
+    def __init__(self, user_id, max_queue_size):
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=max_queue_size)
+
+    def push(self, event):
+        """Queue an event; if the client has fallen behind, replace its backlog with a resync"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # The client only needs to know that something changed, so rather than
+            # blocking the feed, drop what it hasn't read and tell it to resync
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put_nowait({'type': 'resync'})
+
+    def get(self, timeout):
+        """Wait for the next event, returning None on timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeFeed:
+    """Watches the budget collections with a single change stream and routes events by user_id"""
+
+    def __init__(self, database, collections, max_subscribers=500, max_queue_size=100):
+        self._database = database
+        self._collections = list(collections)
+        self._max_subscribers = max_subscribers
+        self._max_queue_size = max_queue_size
+        self._subscribers = {}
+        self._subscriber_count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._resume_token = None
+        self.available = True
+
+    def subscribe(self, user_id):
+        """Register a client for user_id, or return None if the process is at capacity"""
+        with self._lock:
+            if not self.available or self._subscriber_count >= self._max_subscribers:
+                return None
+            subscription = Subscription(user_id, self._max_queue_size)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._subscriber_count += 1
+            # Started lazily so the watcher thread is created after gunicorn forks
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a client when its connection closes"""
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self._subscriber_count -= 1
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    @property
+    def subscriber_count(self):
+        """Open subscriptions in this process"""
+        return self._subscriber_count
+
+    def stats(self):
+        """Current subscriber counts for monitoring"""
+        with self._lock:
+            return {
+                'available': self.available,
+                'subscribers': self._subscriber_count,
+                'users': len(self._subscribers),
+                'watching': self._thread is not None and self._thread.is_alive()
+            }
+
+    def _pipeline(self):
+        # Only the fields needed for routing are sent over the wire
+        return [
+            {'$match': {
+                'ns.coll': {'$in': self._collections},
+                'operationType': {'$in': ['insert', 'update', 'replace']}
+            }},
+            {'$project': {
+                'operationType': 1,
+                'ns.coll': 1,
+                'fullDocument.user_id': 1,
+                'fullDocument.change_seq': 1
+            }}
+        ]
+
+    def _run(self):
+        """Watch until there are no subscribers left, resuming after transient errors"""
+        backoff = 1
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Nobody is listening; a later subscriber starts from "now"
+                    self._thread = None
+                    self._resume_token = None
+                    return
+            try:
+                with self._database.watch(self._pipeline(),
+                                          full_document='updateLookup',
+                                          resume_after=self._resume_token,
+                                          max_await_time_ms=1000) as stream:
+                    logger.info("Change stream opened")
+                    backoff = 1
+                    while stream.alive:
+                        change = stream.try_next()
+                        # Remember the position even on empty batches (post-batch resume token)
+                        self._resume_token = stream.resume_token
+                        if change is not None:
+                            self._dispatch(change)
+                            continue
+                        with self._lock:
+                            if not self._subscribers:
+                                break
+                continue
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning(f"Change streams unavailable, live updates disabled: {str(e)}")
+                    self._shutdown()
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Change stream resume token expired, asking clients to resync")
+                    self._resume_token = None
+                    self._broadcast({'type': 'resync'})
+                    continue
+                logger.error(f"Change stream error: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Change stream error: {str(e)}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _dispatch(self, change):
+        document = change.get('fullDocument')
+        # With updateLookup the document is None if it was deleted in the meantime;
+        # the deletion itself arrives as a tombstone insert
+        if not document or 'user_id' not in document:
+            return
+        event = {
+            'type': 'change',
+            'collection': change['ns']['coll'],
+            'operation': change['operationType'],
+            'change_seq': document.get('change_seq')
+        }
+        with self._lock:
+            subscriptions = list(self._subscribers.get(document['user_id'], ()))
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def _broadcast(self, event):
+        with self._lock:
+            subscriptions = [s for group in self._subscribers.values() for s in group]
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def _shutdown(self):
+        with self._lock:
+            self.available = False
+            subscriptions = [s for group in self._subscribers.values() for s in group]
+            self._thread = None
+        for subscription in subscriptions:
+            subscription.push({'type': 'closed'})
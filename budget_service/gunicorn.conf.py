@@ -0,0 +1,18 @@
+"""
+Gunicorn Settings - Budget Service
+Each worker warms up (templates, storage and auth connections) before it accepts requests
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Threaded workers: every request, and every open event stream for as long as it is
+# connected, holds one thread; app.py caps streams at threads - SSE_RESERVED_THREADS
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+
+def post_worker_init(worker):
+    # Runs in the worker after the app is imported and before its first request
+    from app import warm_up
+    warm_up()
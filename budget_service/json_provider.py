@@ -0,0 +1,67 @@
+"""
+JSON Provider - Serializes MongoDB documents without per-document conversion passes
+Uses orjson when it is installed, otherwise the standard library encoder
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def encode_bson(value):
+    """Encode the BSON and Python types that appear in stored documents"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        # Amounts are floats everywhere else in the API
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes ObjectId, datetime and Decimal128 natively.
+
+    Keys are not sorted: clients don't depend on key order and sorting
+    large expense lists is measurable.
+    """
+
+    sort_keys = False
+    default = staticmethod(encode_bson)
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=encode_bson, option=self._orjson_options()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # orjson produces bytes directly, skipping the str round trip
+        body = orjson.dumps(obj, default=encode_bson, option=self._orjson_options())
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
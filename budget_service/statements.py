@@ -0,0 +1,113 @@
+"""
+Statements - Monthly statement rendering (CSV transactions, HTML/PDF budget vs. actual)
+Runs inside worker.py's process pool, never in a web request
+"""
+
+from datetime import datetime
+import csv
+import hashlib
+import io
+import json
+import os
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+try:
+    from weasyprint import HTML
+except ImportError:  # pragma: no cover - PDF output is optional
+    HTML = None
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+templates = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+
+STATEMENT_FORMATS = {
+    'csv': 'text/csv',
+    'html': 'text/html',
+    'pdf': 'application/pdf',
+}
+
+def month_filters(month):
+    """Expense filters covering one YYYY-MM month"""
+    return {'date_from': f'{month}-01', 'date_to': f'{month}-31'}
+
+def data_version(budgets, expenses):
+    """Digest of everything a statement shows; changes whenever the month's data does"""
+    content = {
+        'budgets': sorted((b['category'], b['amount']) for b in budgets),
+        'expenses': sorted((e['date'], e.get('category', 'Other'), e['amount'], e.get('description') or '')
+                           for e in expenses),
+    }
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()[:32]
+
+def statement_cache_key(user_id, month, version):
+    return f"{user_id}:{month}:{version}"
+
+def build_statement(month, budgets, expenses):
+    """Per-category budget vs. actual for a month, plus its transactions"""
+    budgeted = {}
+    for budget in budgets:
+        budgeted[budget['category']] = budgeted.get(budget['category'], 0.0) + budget['amount']
+    spent = {}
+    for expense in expenses:
+        category = expense.get('category', 'Other')
+        spent[category] = spent.get(category, 0.0) + expense['amount']
+
+    categories = []
+    for category in sorted(set(budgeted) | set(spent)):
+        budget_amount = budgeted.get(category, 0.0)
+        spent_amount = spent.get(category, 0.0)
+        categories.append({
+            'category': category,
+            'budget': budget_amount,
+            'spent': spent_amount,
+            'remaining': budget_amount - spent_amount,
+            'percentage': round(spent_amount / budget_amount * 100, 1) if budget_amount else None
+        })
+
+    return {
+        'month': month,
+        'categories': categories,
+        'transactions': sorted(expenses, key=lambda expense: (expense['date'], expense.get('description') or '')),
+        'total_budget': sum(budgeted.values()),
+        'total_spent': sum(spent.values()),
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M')
+    }
+
+def render_csv(statement):
+    """One row per transaction"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Date', 'Description', 'Category', 'Amount'])
+    for expense in statement['transactions']:
+        writer.writerow([expense['date'], expense.get('description', ''),
+                         expense.get('category', 'Other'), f"{expense['amount']:.2f}"])
+    return output.getvalue()
+
+def render_html(statement):
+    return templates.get_template('statement.html').render(statement=statement)
+
+def render_pdf(html):
+    """PDF version of the HTML statement, or None when WeasyPrint isn't installed"""
+    if HTML is None:
+        return None
+    return HTML(string=html, base_url=TEMPLATE_DIR).write_pdf()
+
+def generate_statement(repository, user_id, month):
+    """Render a user's statement for a month unless an identical one is cached; returns its cache key"""
+    budgets = repository.list_budgets(user_id, month)
+    expenses = repository.list_expenses(user_id, month_filters(month))
+    cache_key = statement_cache_key(user_id, month, data_version(budgets, expenses))
+    if repository.get_statement(cache_key) is not None:
+        return cache_key
+
+    statement = build_statement(month, budgets, expenses)
+    html = render_html(statement)
+    repository.save_statement(cache_key, {
+        'user_id': user_id,
+        'month': month,
+        'csv': render_csv(statement),
+        'html': html,
+        'pdf': render_pdf(html)
+    })
+    return cache_key
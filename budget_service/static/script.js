@@ -71,11 +71,10 @@ async function addMonthlyBudget() {
         if (response.ok) {
             const budget = await response.json();
             addBudgetToList(budget);
-            allBudgets.push(budget);
             form.reset();
             showAlert('Monthly budget added successfully!', 'success');
             updateSummary();
-            updateItemCounters();
+            loadAllData();
         } else {
             const error = await response.json();
             showAlert(error.error || 'Failed to add monthly budget', 'danger');
@@ -117,12 +116,10 @@ async function addDailyExpense() {
         if (response.ok) {
             const expense = await response.json();
             addExpenseToList(expense);
-            allExpenses.push(expense);
             form.reset();
             showAlert('Daily expense added successfully!', 'success');
             updateSummary();
-            updateExpenseChart();
-            updateItemCounters();
+            loadAllData();
         } else {
             const error = await response.json();
             showAlert(error.error || 'Failed to add daily expense', 'danger');
@@ -202,17 +199,11 @@ function addExpenseToList(expense) {
     const expenseElement = document.createElement('div');
     expenseElement.className = 'expense-item mb-2 p-2 border rounded fade-in';
     expenseElement.setAttribute('data-expense-id', expense._id);
-    expenseElement.innerHTML = `
-        <div class="d-flex justify-content-between align-items-center">
-            <div class="d-flex align-items-center">
-                <input type="checkbox" class="form-check-input me-2 bulk-select-checkbox" data-id="${expense._id}" style="display: none;">
-                <div>
-                    <strong>${expense.description}</strong>
-                    <small class="text-muted d-block">${expense.category} - ${expense.date}</small>
-                </div>
-            </div>
-            <div class="d-flex align-items-center gap-2">
-                <span class="badge bg-danger">$${expense.amount.toFixed(2)}</span>
+    // Archived expenses are read-only, so they get no checkbox or edit/delete buttons
+    const checkbox = expense.archived ? '' : `
+                <input type="checkbox" class="form-check-input me-2 bulk-select-checkbox" data-id="${expense._id}" style="display: none;">`;
+    const actions = expense.archived ? `
+                <span class="text-muted small" title="Archived expenses are read-only"><i class="fas fa-box-archive"></i></span>` : `
                 <button class="btn btn-sm btn-outline-primary edit-expense-btn" 
                         data-id="${expense._id}" 
                         data-description="${expense.description}" 
@@ -223,7 +214,17 @@ function addExpenseToList(expense) {
                 </button>
                 <button class="btn btn-sm btn-outline-danger delete-expense-btn" data-id="${expense._id}">
                     <i class="fas fa-trash"></i>
-                </button>
+                </button>`;
+    expenseElement.innerHTML = `
+        <div class="d-flex justify-content-between align-items-center">
+            <div class="d-flex align-items-center">${checkbox}
+                <div>
+                    <strong>${expense.description}</strong>
+                    <small class="text-muted d-block">${expense.category} - ${expense.date}</small>
+                </div>
+            </div>
+            <div class="d-flex align-items-center gap-2">
+                <span class="badge bg-danger">$${expense.amount.toFixed(2)}</span>${actions}
             </div>
         </div>
     `;
@@ -351,6 +352,7 @@ async function deleteBudget(id) {
             }
             showAlert('Budget deleted successfully!', 'success');
             updateSummary();
+            loadAllData();
         } else {
             const error = await response.json();
             showAlert(error.error || 'Failed to delete budget', 'danger');
@@ -400,6 +402,7 @@ async function deleteExpense(id) {
             }
             showAlert('Expense deleted successfully!', 'success');
             updateSummary();
+            loadAllData();
         } else {
             const error = await response.json();
             showAlert(error.error || 'Failed to delete expense', 'danger');
@@ -480,6 +483,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     showAlert('Budget updated successfully!', 'success');
                     cancelEditBudget();
                     updateSummary();
+                    loadAllData();
                 } else {
                     const error = await response.json();
                     showAlert(error.error || 'Failed to update budget', 'danger');
@@ -526,6 +530,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     showAlert('Expense updated successfully!', 'success');
                     cancelEditExpense();
                     updateSummary();
+                    loadAllData();
                 } else {
                     const error = await response.json();
                     showAlert(error.error || 'Failed to update expense', 'danger');
@@ -542,6 +547,11 @@ document.addEventListener('DOMContentLoaded', function() {
 let expenseChart = null;
 let allBudgets = [];
 let allExpenses = [];
+let expenseFilterTimer = null;
+let syncToken = '';
+let expenseFiltersActive = false;
+let liveRefreshTimer = null;
+let expenseFilterRequestId = 0;
 
 // Initialize enhanced dashboard features
 document.addEventListener('DOMContentLoaded', function() {
@@ -617,6 +627,96 @@ function initializeEnhancedFeatures() {
     
     // Load initial data
     loadAllData();
+    
+    // Refresh when this user's data changes in another tab or device
+    initializeLiveUpdates();
+    
+    // Monthly statements are generated in the background
+    document.getElementById('statementMonth').value = new Date().toISOString().slice(0, 7);
+    document.getElementById('statementBtn').addEventListener('click', requestStatement);
+}
+
+async function requestStatement() {
+    const button = document.getElementById('statementBtn');
+    const month = document.getElementById('statementMonth').value;
+    if (!month) {
+        showAlert('Please choose a month', 'warning');
+        return;
+    }
+    
+    button.disabled = true;
+    try {
+        const response = await fetch('/api/statements', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({month: month})
+        });
+        let job = await response.json();
+        if (!response.ok) {
+            showAlert(job.error || 'Failed to request statement', 'danger');
+            return;
+        }
+        
+        showAlert(`Preparing statement for ${month}...`, 'info');
+        const statusUrl = response.headers.get('Location');
+        for (let attempt = 0; attempt < 60 && (job.status === 'queued' || job.status === 'running'); attempt++) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            job = await (await fetch(statusUrl)).json();
+        }
+        
+        if (job.status === 'done') {
+            showAlert(`Statement for ${month} is ready: ` +
+                      `<a href="${job.downloads.html}">HTML</a> · <a href="${job.downloads.csv}">CSV</a>`, 'success');
+        } else if (job.status === 'failed') {
+            showAlert('Statement generation failed', 'danger');
+        } else {
+            showAlert('Statement is still being prepared, please try again shortly', 'warning');
+        }
+    } catch (error) {
+        console.error('Error requesting statement:', error);
+        showAlert('Error requesting statement', 'danger');
+    } finally {
+        button.disabled = false;
+    }
+}
+
+function initializeLiveUpdates() {
+    if (!window.EventSource) return;
+    
+    const source = new EventSource('/api/events');
+    source.addEventListener('change', scheduleLiveRefresh);
+    source.addEventListener('resync', scheduleLiveRefresh);
+    source.addEventListener('error', () => {
+        // Rejected streams (e.g. 503 when the worker is at its stream limit) aren't retried by the browser
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(initializeLiveUpdates, 60000);
+        }
+    });
+}
+
+function scheduleLiveRefresh() {
+    // Coalesce bursts of events into a single delta sync
+    clearTimeout(liveRefreshTimer);
+    liveRefreshTimer = setTimeout(async () => {
+        await loadAllData();
+        renderAllItems();
+    }, 300);
+}
+
+function renderAllItems() {
+    const budgetContainer = document.getElementById('monthlyBudgetsList');
+    budgetContainer.innerHTML = '';
+    allBudgets.forEach(budget => addBudgetToList(budget));
+    
+    if (expenseFiltersActive) {
+        // Re-applies the budget filter and refetches the filtered expenses
+        filterItems();
+    } else {
+        renderExpenseList(allExpenses);
+    }
+    
+    updateSummary();
+    updateItemCounters();
 }
 
 function filterItems() {
@@ -625,12 +725,10 @@ function filterItems() {
     const yearFilter = document.getElementById('yearFilter').value;
     
     const budgetItems = document.querySelectorAll('.budget-item');
-    const expenseItems = document.querySelectorAll('.expense-item');
     
     let visibleBudgets = 0;
-    let visibleExpenses = 0;
     
-    // Filter budgets
+    // Filter budgets (a user has few budgets, so this stays client-side)
     budgetItems.forEach(item => {
         const category = item.querySelector('strong').textContent.toLowerCase();
         const month = item.querySelector('.text-muted').textContent;
@@ -642,22 +740,81 @@ function filterItems() {
         if (isVisible) visibleBudgets++;
     });
     
-    // Filter expenses
-    expenseItems.forEach(item => {
-        const description = item.querySelector('strong').textContent.toLowerCase();
-        const category = item.querySelector('.text-muted').textContent.toLowerCase();
-        const date = item.querySelector('.text-muted').textContent;
-        const isVisible = (searchTerm === '' || description.includes(searchTerm) || category.includes(searchTerm)) &&
-                         (monthFilter === '' || date.includes(monthFilter)) &&
-                         (yearFilter === '' || date.includes(yearFilter));
-        
-        item.style.display = isVisible ? 'block' : 'none';
-        if (isVisible) visibleExpenses++;
-    });
-    
-    // Update counters
     document.getElementById('budgetCount').textContent = `${visibleBudgets} items`;
-    document.getElementById('expenseCount').textContent = `${visibleExpenses} items`;
+    
+    // Expenses are filtered on the server; debounce so typing doesn't fire a request per key
+    clearTimeout(expenseFilterTimer);
+    expenseFiltersActive = buildExpenseFilterParams().toString() !== '';
+    if (!expenseFiltersActive) {
+        // Filters cleared: show the synced list again and drop any filter request in flight
+        expenseFilterRequestId++;
+        renderExpenseList(allExpenses);
+        return;
+    }
+    expenseFilterTimer = setTimeout(loadFilteredExpenses, 250);
+}
+
+function renderExpenseList(expenses) {
+    const container = document.getElementById('dailyExpensesList');
+    container.innerHTML = '';
+    expenses.forEach(expense => addExpenseToList(expense));
+    document.getElementById('expenseCount').textContent = `${expenses.length} items`;
+}
+
+function matchingCategories(searchTerm) {
+    // Like the old client-side search, the box also matches category names
+    const term = searchTerm.toLowerCase();
+    const categories = new Set(allExpenses.map(expense => expense.category || 'Other'));
+    document.querySelectorAll('#expenseCategory option').forEach(option => categories.add(option.value));
+    return Array.from(categories).filter(category => category.toLowerCase().includes(term));
+}
+
+function buildExpenseFilterParams() {
+    const params = new URLSearchParams();
+    const searchTerm = document.getElementById('searchInput').value.trim();
+    const monthFilter = document.getElementById('monthFilter').value;
+    const yearFilter = document.getElementById('yearFilter').value;
+    
+    if (searchTerm) params.set('q', searchTerm);
+    if (monthFilter) params.set('month', monthFilter);
+    if (yearFilter) params.set('year', yearFilter);
+    return params;
+}
+
+async function loadFilteredExpenses() {
+    const requestId = ++expenseFilterRequestId;
+    const params = buildExpenseFilterParams();
+    const requests = [fetch(`/api/daily-expenses?${params}`)];
+    
+    // q only searches descriptions; expenses in a matching category are fetched alongside
+    const searchTerm = params.get('q');
+    const categories = searchTerm ? matchingCategories(searchTerm) : [];
+    if (categories.length > 0) {
+        const categoryParams = new URLSearchParams(params);
+        categoryParams.delete('q');
+        categoryParams.set('category', categories.join(','));
+        requests.push(fetch(`/api/daily-expenses?${categoryParams}`));
+    }
+    
+    try {
+        const responses = await Promise.all(requests);
+        // Ignore responses that arrive after a newer filter was requested
+        if (requestId !== expenseFilterRequestId) return;
+        
+        const failed = responses.find(response => !response.ok);
+        if (failed) {
+            const error = await failed.json();
+            showAlert(error.error || 'Failed to filter expenses', 'danger');
+            return;
+        }
+        
+        const results = await Promise.all(responses.map(response => response.json()));
+        if (requestId !== expenseFilterRequestId) return;
+        // Either match counts; mergeSyncDelta dedupes by _id
+        renderExpenseList(results.reduce((merged, expenses) => mergeSyncDelta(merged, expenses, []), []));
+    } catch (error) {
+        console.error('Error filtering expenses:', error);
+    }
 }
 
 function initializeExpenseChart() {
@@ -713,16 +870,18 @@ function updateExpenseChart() {
 
 async function loadAllData() {
     try {
-        // Load budgets
-        const budgetResponse = await fetch('/api/monthly-budgets');
-        if (budgetResponse.ok) {
-            allBudgets = await budgetResponse.json();
-        }
-        
-        // Load expenses
-        const expenseResponse = await fetch('/api/daily-expenses');
-        if (expenseResponse.ok) {
-            allExpenses = await expenseResponse.json();
+        // Fetch only what changed since the last sync (the full lists on first load)
+        const response = await fetch(`/api/sync?since=${encodeURIComponent(syncToken)}`);
+        if (response.ok) {
+            const delta = await response.json();
+            if (delta.reset) {
+                allBudgets = delta.budgets;
+                allExpenses = delta.expenses;
+            } else {
+                allBudgets = mergeSyncDelta(allBudgets, delta.budgets, delta.deleted.budgets);
+                allExpenses = mergeSyncDelta(allExpenses, delta.expenses, delta.deleted.expenses);
+            }
+            syncToken = delta.token;
         }
         
         // Update chart and counters
@@ -734,6 +893,13 @@ async function loadAllData() {
     }
 }
 
+function mergeSyncDelta(items, changedItems, deletedIds) {
+    const byId = new Map(items.map(item => [item._id, item]));
+    changedItems.forEach(item => byId.set(item._id, item));
+    deletedIds.forEach(id => byId.delete(id));
+    return Array.from(byId.values());
+}
+
 function updateItemCounters() {
     const budgetItems = document.querySelectorAll('.budget-item');
     const expenseItems = document.querySelectorAll('.expense-item');
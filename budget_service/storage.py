@@ -0,0 +1,1210 @@
+"""
+Storage - Repository interface for budgets, expenses and users
+MongoDB implementation for clustered deployments, embedded SQLite for single-node setups and tests
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby
+import heapq
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+from pymongo import MongoClient, ASCENDING, TEXT, ReturnDocument
+import pymongo
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCE_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+# Server error code for transactions on a standalone server (they need a replica set)
+TRANSACTIONS_UNSUPPORTED = 20
+
+# Smallest maxStalenessSeconds MongoDB accepts; lower values fail every secondary read
+MIN_MAX_STALENESS_SECONDS = 90
+
+# Rendered outputs stored with each cached statement
+STATEMENT_BLOBS = ('csv', 'html', 'pdf')
+
+def build_read_preference(mode, max_staleness_seconds):
+    """Build the read preference used for read-only and analytics queries"""
+    preference_class = READ_PREFERENCE_MODES.get(mode)
+    if preference_class is None:
+        logger.warning(f"Unknown read preference '{mode}', falling back to primary")
+        return Primary()
+    if preference_class is Primary:
+        return Primary()
+    if max_staleness_seconds <= 0:
+        max_staleness_seconds = -1
+    elif max_staleness_seconds < MIN_MAX_STALENESS_SECONDS:
+        logger.warning(f"Max staleness of {max_staleness_seconds} s is below MongoDB's minimum, "
+                       f"using {MIN_MAX_STALENESS_SECONDS} s")
+        max_staleness_seconds = MIN_MAX_STALENESS_SECONDS
+    return preference_class(max_staleness=max_staleness_seconds)
+
+# Archived expenses are stored column-wise, one bucket per (user, month)
+ARCHIVE_COLUMNS = {
+    'ids': '_id',
+    'dates': 'date',
+    'amounts': 'amount',
+    'categories': 'category',
+    'descriptions': 'description',
+}
+
+def pack_expenses(expenses, bucket=None):
+    """Append expenses to a (possibly empty) archive bucket, updating its totals"""
+    bucket = bucket or {column: [] for column in ARCHIVE_COLUMNS}
+    bucket.setdefault('count', 0)
+    bucket.setdefault('total', 0.0)
+    bucket.setdefault('category_totals', {})
+    for expense in expenses:
+        for column, field in ARCHIVE_COLUMNS.items():
+            value = expense.get(field)
+            bucket[column].append(str(value) if field == '_id' else value)
+        category = expense.get('category', 'Other')
+        bucket['category_totals'][category] = bucket['category_totals'].get(category, 0.0) + expense['amount']
+        bucket['total'] += expense['amount']
+        bucket['count'] += 1
+    return bucket
+
+def drop_from_bucket(bucket, ids):
+    """Remove expenses by id from an archive bucket, recomputing its totals"""
+    ids = {str(expense_id) for expense_id in ids}
+    rows = [dict(zip(ARCHIVE_COLUMNS.values(), values))
+            for values in zip(*(bucket[column] for column in ARCHIVE_COLUMNS))]
+    return pack_expenses([row for row in rows if row['_id'] not in ids])
+
+def empty_expense_columns():
+    """Column lists for a columnar expense pull: the archive columns plus 'user_ids'"""
+    return {column: [] for column in list(ARCHIVE_COLUMNS) + ['user_ids']}
+
+def append_expense_columns(columns, user_id, bucket):
+    """Extend expense columns with one bucket's arrays (an archive bucket or a grouped pull)"""
+    for column in ARCHIVE_COLUMNS:
+        columns[column].extend(bucket[column])
+    columns['user_ids'].extend([user_id] * len(bucket['ids']))
+
+def archive_month_range(filters):
+    """Bucket months that can contain expenses matching the filters' date range"""
+    filters = filters or {}
+    return (filters['date_from'][:7] if filters.get('date_from') else None,
+            filters['date_to'][:7] if filters.get('date_to') else None)
+
+def unpack_bucket(bucket, filters=None):
+    """Expand an archive bucket into expense rows, keeping those that match the filters"""
+    filters = filters or {}
+    categories = filters.get('categories')
+    if categories and not any(c in bucket.get('category_totals', {}) for c in categories):
+        return []
+    terms = [term.lower() for term in (filters.get('search') or '').split()]
+    rows = []
+    for values in zip(*(bucket[column] for column in ARCHIVE_COLUMNS)):
+        row = dict(zip(ARCHIVE_COLUMNS.values(), values))
+        if filters.get('date_from') and row['date'] < filters['date_from']:
+            continue
+        if filters.get('date_to') and row['date'] > filters['date_to']:
+            continue
+        if categories and row['category'] not in categories:
+            continue
+        if filters.get('min_amount') is not None and row['amount'] < filters['min_amount']:
+            continue
+        if filters.get('max_amount') is not None and row['amount'] > filters['max_amount']:
+            continue
+        # Substring match, an approximation of the hot path's stemmed full-text search
+        if terms and not any(term in (row['description'] or '').lower() for term in terms):
+            continue
+        row['user_id'] = bucket['user_id']
+        row['archived'] = True
+        rows.append(row)
+    return rows
+
+
+class Repository(ABC):
+    """Data access for budgets, expenses and users.
+
+    Documents are plain dicts whose '_id' is a string or, for MongoDB, an
+    ObjectId; the app's JSON provider serializes both. Expense filters are
+    backend-neutral dicts with any of: date_from, date_to (inclusive
+    YYYY-MM-DD), categories (list), min_amount, max_amount and search.
+    Every write stamps a per-user monotonic 'change_seq', and deletes
+    leave tombstones, which is what delta sync is built on. A change_seq
+    commits together with its write, so once current_change_seq returns
+    N, every change up to N can be read.
+
+    Old expenses can be compacted into per-(user, month) archive buckets;
+    list_expenses returns hot and archived expenses together, the latter
+    marked 'archived' and read-only. Archiving leaves an 'archive'
+    tombstone, which tells delta sync clients to reload the user's lists.
+
+    Background jobs are queued here too and claimed by worker.py; their
+    rendered results (monthly statements) are cached by content key.
+    Statements and finished jobs are removed after statement_retention_days.
+    """
+
+    @abstractmethod
+    def ensure_indexes(self, timeout=None):
+        """Create tables/indexes if missing (idempotent); raises if not done within timeout seconds"""
+
+    @abstractmethod
+    def ping(self, timeout=2):
+        """Round trip to the database; raises if it is unreachable within timeout seconds"""
+
+    # Budgets
+
+    @abstractmethod
+    def list_budgets(self, user_id, month=None):
+        """Budgets of a user, optionally for a single YYYY-MM month"""
+
+    @abstractmethod
+    def create_budget(self, user_id, budget_data):
+        """Insert a budget and return it with its '_id'"""
+
+    @abstractmethod
+    def update_budget(self, user_id, budget_id, fields):
+        """Update a user's budget; returns the updated budget or None if not found"""
+
+    @abstractmethod
+    def delete_budget(self, user_id, budget_id):
+        """Delete a user's budget; returns False if not found"""
+
+    # Expenses
+
+    @abstractmethod
+    def list_expenses(self, user_id, filters=None):
+        """Hot and archived expenses of a user matching the optional filters"""
+
+    @abstractmethod
+    def create_expense(self, user_id, expense_data):
+        """Insert an expense and return it with its '_id'"""
+
+    @abstractmethod
+    def update_expense(self, user_id, expense_id, fields):
+        """Update a user's expense; returns the updated expense or None if not found"""
+
+    @abstractmethod
+    def delete_expense(self, user_id, expense_id):
+        """Delete a user's expense; returns False if not found"""
+
+    @abstractmethod
+    def archive_expenses(self, before_month):
+        """Move expenses dated before YYYY-MM into archive buckets; returns counts"""
+
+    # Batch analytics
+
+    @abstractmethod
+    def expense_user_ids(self, after_user_id=None, limit=1000):
+        """Up to `limit` ascending ids (> after_user_id) of users with hot or archived expenses"""
+
+    @abstractmethod
+    def expense_columns(self, user_ids):
+        """Hot and archived expenses of the given users as column lists (see empty_expense_columns)"""
+
+    # Delta sync
+
+    @abstractmethod
+    def current_change_seq(self, user_id):
+        """Highest change_seq of the user's committed writes (0 if none)"""
+
+    @abstractmethod
+    def changes_since(self, user_id, since_seq):
+        """Return (budgets, expenses, tombstones) with change_seq > since_seq"""
+
+    # Background jobs
+
+    @abstractmethod
+    def enqueue_job(self, user_id, kind, params):
+        """Queue a job, or return the user's queued/running job with the same kind and params"""
+
+    @abstractmethod
+    def get_job(self, user_id, job_id):
+        """Return a user's job or None"""
+
+    @abstractmethod
+    def claim_job(self):
+        """Atomically mark the oldest queued job as running and return it, or None"""
+
+    @abstractmethod
+    def finish_job(self, job_id, result_key=None, error=None):
+        """Mark a running job as done (with its result key) or failed (with an error)"""
+
+    @abstractmethod
+    def requeue_stale_jobs(self, started_before, max_attempts):
+        """Requeue jobs running since before the ISO timestamp, failing those out of attempts; returns counts"""
+
+    # Statement cache
+
+    @abstractmethod
+    def get_statement(self, cache_key):
+        """Return a rendered statement (csv, html, pdf) by cache key, or None"""
+
+    @abstractmethod
+    def save_statement(self, cache_key, statement):
+        """Store a rendered statement under its cache key (idempotent)"""
+
+    @abstractmethod
+    def statement_formats(self, cache_key):
+        """Names of the outputs stored for a statement, without loading them; [] if it isn't cached"""
+
+    # Users
+
+    @abstractmethod
+    def get_user_by_username(self, username):
+        """Return the user document or None"""
+
+    @abstractmethod
+    def create_user(self, user_data):
+        """Insert a user and return it with its '_id'"""
+
+
+class MongoRepository(Repository):
+    """MongoDB-backed repository.
+
+    Read-only queries use read_preference unless use_primary() returns True,
+    which lets the web layer pin a user to the primary after a write.
+
+    Writes allocate their change_seq in the same transaction as the change,
+    so a user's concurrent writes commit in change_seq order. A standalone
+    server has no transactions; there the two are separate operations.
+    """
+
+    def __init__(self, database, read_preference=None, use_primary=None, tombstone_retention_days=30,
+                 statement_retention_days=7):
+        self.db = database
+        self.read_preference = read_preference or Primary()
+        self._use_primary = use_primary or (lambda: False)
+        self.tombstone_retention_days = tombstone_retention_days
+        self.statement_retention_days = statement_retention_days
+        self.monthly_budgets = database.monthly_budgets
+        self.daily_expenses = database.daily_expenses
+        self.users = database.users
+        self.sync_counters = database.sync_counters
+        self.sync_tombstones = database.sync_tombstones
+        self.expense_archive = database.expense_archive
+        self.jobs = database.jobs
+        self.statements = database.statements
+        self.transactions = True
+
+    def reader(self, collection):
+        """Return the collection to use for a read-only query"""
+        if self._use_primary():
+            return collection
+        return collection.with_options(read_preference=self.read_preference)
+
+    def ensure_indexes(self, timeout=None):
+        with pymongo.timeout(timeout):
+            self._create_indexes()
+
+    def _create_indexes(self):
+        self.monthly_budgets.create_index(
+            [('user_id', ASCENDING), ('month', ASCENDING)])
+        # Date range filters and the default per-user listing
+        self.daily_expenses.create_index(
+            [('user_id', ASCENDING), ('date', ASCENDING)])
+        # Category filter, optionally combined with a date range
+        self.daily_expenses.create_index(
+            [('user_id', ASCENDING), ('category', ASCENDING), ('date', ASCENDING)])
+        # Amount range filter
+        self.daily_expenses.create_index(
+            [('user_id', ASCENDING), ('amount', ASCENDING)])
+        # Text search over descriptions; the user_id prefix keeps each search inside one user's data
+        self.daily_expenses.create_index(
+            [('user_id', ASCENDING), ('description', TEXT)])
+        # Delta sync: changes since a given per-user sequence number
+        self.monthly_budgets.create_index(
+            [('user_id', ASCENDING), ('change_seq', ASCENDING)])
+        self.daily_expenses.create_index(
+            [('user_id', ASCENDING), ('change_seq', ASCENDING)])
+        self.sync_tombstones.create_index(
+            [('user_id', ASCENDING), ('change_seq', ASCENDING)])
+        self.sync_tombstones.create_index(
+            'deleted_at', expireAfterSeconds=self.tombstone_retention_days * 86400)
+        # One archive bucket per user and month
+        self.expense_archive.create_index(
+            [('user_id', ASCENDING), ('month', ASCENDING)], unique=True)
+        # Job queue: workers claim the oldest queued job; users look up their active jobs
+        self.jobs.create_index(
+            [('status', ASCENDING), ('created_at', ASCENDING)])
+        self.jobs.create_index(
+            [('user_id', ASCENDING), ('kind', ASCENDING), ('status', ASCENDING)])
+        # At most one queued or running job per request; 'active' is removed when a job ends
+        self.jobs.create_index(
+            [('user_id', ASCENDING), ('kind', ASCENDING), ('params', ASCENDING)],
+            unique=True, partialFilterExpression={'active': True})
+        # Every data change renders a new statement; old ones and finished jobs expire.
+        # Both fields are BSON dates (queued and running jobs have no finished_at)
+        self.statements.create_index(
+            'created_at', expireAfterSeconds=self.statement_retention_days * 86400)
+        self.jobs.create_index(
+            'finished_at', expireAfterSeconds=self.statement_retention_days * 86400)
+
+    def ping(self, timeout=2):
+        with pymongo.timeout(timeout):
+            self.db.command('ping')
+
+    def _atomic(self, write):
+        """Run write(session) in a transaction (retried on write conflicts) and return its result"""
+        if self.transactions:
+            try:
+                with self.db.client.start_session() as session:
+                    return session.with_transaction(write)
+            except OperationFailure as e:
+                if e.code != TRANSACTIONS_UNSUPPORTED:
+                    raise
+                # Standalone server: fall back to separate operations
+                logger.warning("MongoDB transactions unavailable, change sequences are allocated "
+                               "outside the write; delta sync needs a replica set to be exact")
+                self.transactions = False
+        return write(None)
+
+    def _next_change_seq(self, user_id, session):
+        # Inside a transaction this also locks the user's counter until commit
+        counter = self.sync_counters.find_one_and_update(
+            {'_id': user_id},
+            {'$inc': {'seq': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        return counter['seq']
+
+    def _record_tombstone(self, user_id, kind, item_id, session):
+        self.sync_tombstones.insert_one({
+            'user_id': user_id,
+            'kind': kind,
+            'item_id': item_id,
+            'change_seq': self._next_change_seq(user_id, session),
+            'deleted_at': datetime.utcnow()  # BSON date, required by the TTL index
+        }, session=session)
+
+    def _insert(self, collection, user_id, data):
+        data['user_id'] = user_id
+        data['created_at'] = datetime.now().isoformat()
+
+        def write(session):
+            data['change_seq'] = self._next_change_seq(user_id, session)
+            collection.insert_one(data, session=session)
+        self._atomic(write)
+        return data
+
+    def _update(self, collection, user_id, item_id, fields):
+        def write(session):
+            updated = collection.find_one_and_update(
+                {'_id': ObjectId(item_id), 'user_id': user_id},
+                {'$set': dict(fields, updated_at=datetime.now().isoformat(),
+                              change_seq=self._next_change_seq(user_id, session))},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if updated is None:
+                # Undo the sequence allocation as well
+                raise _NotFound()
+            return updated
+        try:
+            return self._atomic(write)
+        except _NotFound:
+            return None
+
+    def _delete(self, collection, kind, user_id, item_id):
+        def write(session):
+            result = collection.delete_one({'_id': ObjectId(item_id), 'user_id': user_id}, session=session)
+            if result.deleted_count == 0:
+                return False
+            self._record_tombstone(user_id, kind, item_id, session)
+            return True
+        return self._atomic(write)
+
+    @staticmethod
+    def expense_query(user_id, filters):
+        """Translate neutral expense filters into a MongoDB query"""
+        query = {'user_id': user_id}
+        filters = filters or {}
+        date_query = {}
+        if filters.get('date_from'):
+            date_query['$gte'] = filters['date_from']
+        if filters.get('date_to'):
+            date_query['$lte'] = filters['date_to']
+        if date_query:
+            query['date'] = date_query
+        categories = filters.get('categories')
+        if categories:
+            query['category'] = categories[0] if len(categories) == 1 else {'$in': list(categories)}
+        amount_query = {}
+        if filters.get('min_amount') is not None:
+            amount_query['$gte'] = filters['min_amount']
+        if filters.get('max_amount') is not None:
+            amount_query['$lte'] = filters['max_amount']
+        if amount_query:
+            query['amount'] = amount_query
+        if filters.get('search'):
+            query['$text'] = {'$search': filters['search']}
+        return query
+
+    def list_budgets(self, user_id, month=None):
+        query = {'user_id': user_id}
+        if month:
+            query['month'] = month
+        return list(self.reader(self.monthly_budgets).find(query))
+
+    def create_budget(self, user_id, budget_data):
+        return self._insert(self.monthly_budgets, user_id, budget_data)
+
+    def update_budget(self, user_id, budget_id, fields):
+        return self._update(self.monthly_budgets, user_id, budget_id, fields)
+
+    def delete_budget(self, user_id, budget_id):
+        return self._delete(self.monthly_budgets, 'budget', user_id, budget_id)
+
+    def list_expenses(self, user_id, filters=None):
+        query = self.expense_query(user_id, filters)
+        expenses = list(self.reader(self.daily_expenses).find(query))
+        return self._archived_expenses(user_id, filters) + expenses
+
+    def _archived_expenses(self, user_id, filters):
+        query = {'user_id': user_id}
+        first_month, last_month = archive_month_range(filters)
+        if first_month or last_month:
+            query['month'] = {}
+            if first_month:
+                query['month']['$gte'] = first_month
+            if last_month:
+                query['month']['$lte'] = last_month
+        rows = []
+        for bucket in self.reader(self.expense_archive).find(query).sort('month', ASCENDING):
+            rows.extend(unpack_bucket(bucket, filters))
+        return rows
+
+    def archive_expenses(self, before_month):
+        cutoff = f'{before_month}-01'
+        stats = {'users': 0, 'buckets': 0, 'expenses': 0}
+        for user_id in self.daily_expenses.distinct('user_id'):
+            cursor = self.daily_expenses.find(
+                {'user_id': user_id, 'date': {'$lt': cutoff}}, {'date': 1}).sort('date', ASCENDING)
+            archived_any = False
+            for month, expenses in groupby(cursor, key=lambda expense: expense['date'][:7]):
+                # One transaction per bucket, so an edit made meanwhile conflicts and is retried
+                archived = self._atomic(self._archive_month(user_id, month, [e['_id'] for e in expenses]))
+                stats['buckets'] += 1
+                stats['expenses'] += archived
+                archived_any = True
+            stats['users'] += archived_any
+        return stats
+
+    def _archive_month(self, user_id, month, expense_ids):
+        """Transaction body moving the given expenses of one month into its bucket"""
+        def write(session):
+            expenses = list(self.daily_expenses.find(
+                {'_id': {'$in': expense_ids}, 'user_id': user_id}, session=session))
+            if not expenses:
+                return 0
+            bucket = self.expense_archive.find_one({'user_id': user_id, 'month': month}, session=session)
+            # Ids already in the bucket were packed by a run that stopped before deleting them;
+            # the hot copy wins, it may have been edited since
+            if bucket and set(bucket['ids']) & {str(e['_id']) for e in expenses}:
+                bucket = drop_from_bucket(bucket, [e['_id'] for e in expenses])
+            bucket = self._save_bucket(user_id, month, pack_expenses(expenses, bucket), session)
+
+            # Only delete once the bucket is written, and only the versions that were packed.
+            # One by one, so we know exactly which expenses left the hot collection.
+            kept = [e['_id'] for e in expenses if not self.daily_expenses.delete_one(
+                {'_id': e['_id'], 'change_seq': e.get('change_seq')}, session=session).deleted_count]
+            if kept:
+                # Edited or deleted after they were read (possible without transactions):
+                # an edited expense stays hot, a deleted one must not survive in the bucket
+                self._save_bucket(user_id, month, drop_from_bucket(bucket, kept), session)
+            # Delta sync clients still hold editable copies of these expenses
+            self._record_tombstone(user_id, 'archive', month, session)
+            return len(expenses) - len(kept)
+        return write
+
+    def _save_bucket(self, user_id, month, bucket, session):
+        bucket.update({'user_id': user_id, 'month': month, 'archived_at': datetime.utcnow()})
+        bucket.pop('_id', None)
+        self.expense_archive.replace_one({'user_id': user_id, 'month': month}, bucket,
+                                         upsert=True, session=session)
+        return bucket
+
+    def expense_user_ids(self, after_user_id=None, limit=1000):
+        # Both collections are walked in user_id order and merged, one index seek per user
+        streams = [self._distinct_user_ids(collection, after_user_id)
+                   for collection in (self.daily_expenses, self.expense_archive)]
+        user_ids = []
+        for user_id in heapq.merge(*streams):
+            if user_ids and user_ids[-1] == user_id:
+                continue
+            user_ids.append(user_id)
+            if len(user_ids) == limit:
+                break
+        return user_ids
+
+    def _distinct_user_ids(self, collection, after_user_id):
+        """Yield a collection's user_ids in ascending order, each found by a seek on a user_id-prefixed index"""
+        collection = self.reader(collection)
+        while True:
+            query = {'user_id': {'$gt': after_user_id}} if after_user_id is not None else {}
+            document = collection.find_one(query, {'_id': 0, 'user_id': 1}, sort=[('user_id', ASCENDING)])
+            if document is None:
+                return
+            after_user_id = document['user_id']
+            yield after_user_id
+
+    def expense_columns(self, user_ids):
+        columns = empty_expense_columns()
+        match = {'user_id': {'$in': list(user_ids)}}
+        # Grouped server-side into per-(user, month) arrays, the same shape as archive buckets
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {'user_id': '$user_id', 'month': {'$substrBytes': ['$date', 0, 7]}},
+                'ids': {'$push': '$_id'},
+                'dates': {'$push': '$date'},
+                'amounts': {'$push': '$amount'},
+                'categories': {'$push': {'$ifNull': ['$category', 'Other']}},
+                'descriptions': {'$push': {'$ifNull': ['$description', '']}},
+            }}
+        ]
+        for group in self.reader(self.daily_expenses).aggregate(pipeline, allowDiskUse=True):
+            append_expense_columns(columns, group['_id']['user_id'], group)
+        for bucket in self.reader(self.expense_archive).find(match):
+            append_expense_columns(columns, bucket['user_id'], bucket)
+        return columns
+
+    def create_expense(self, user_id, expense_data):
+        return self._insert(self.daily_expenses, user_id, expense_data)
+
+    def update_expense(self, user_id, expense_id, fields):
+        return self._update(self.daily_expenses, user_id, expense_id, fields)
+
+    def delete_expense(self, user_id, expense_id):
+        return self._delete(self.daily_expenses, 'expense', user_id, expense_id)
+
+    # Sync positions and deltas are read from the primary: a secondary may not
+    # have replicated every change up to the position yet
+
+    def current_change_seq(self, user_id):
+        counter = self.sync_counters.find_one({'_id': user_id})
+        return counter['seq'] if counter else 0
+
+    def changes_since(self, user_id, since_seq):
+        changed = {'user_id': user_id, 'change_seq': {'$gt': since_seq}}
+        budgets = list(self.monthly_budgets.find(changed))
+        expenses = list(self.daily_expenses.find(changed))
+        tombstones = list(self.sync_tombstones.find(
+            changed, {'_id': 0, 'kind': 1, 'item_id': 1, 'change_seq': 1}))
+        return budgets, expenses, tombstones
+
+    # Jobs are read from the primary: status polling must not lag behind the worker
+
+    def enqueue_job(self, user_id, kind, params):
+        query = {'user_id': user_id, 'kind': kind, 'params': params, 'active': True}
+        while True:
+            active = self.jobs.find_one(query)
+            if active:
+                return active
+            job = {
+                'user_id': user_id,
+                'kind': kind,
+                'params': params,
+                'status': 'queued',
+                'active': True,
+                'attempts': 0,
+                'created_at': datetime.now().isoformat()
+            }
+            try:
+                self.jobs.insert_one(job)
+                return job
+            except DuplicateKeyError:
+                # A concurrent request queued the same job first; return that one
+                continue
+
+    def get_job(self, user_id, job_id):
+        if not ObjectId.is_valid(job_id):
+            return None
+        return self.jobs.find_one({'_id': ObjectId(job_id), 'user_id': user_id})
+
+    def claim_job(self):
+        return self.jobs.find_one_and_update(
+            {'status': 'queued'},
+            {'$set': {'status': 'running', 'started_at': datetime.now().isoformat()},
+             '$inc': {'attempts': 1}},
+            sort=[('created_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def finish_job(self, job_id, result_key=None, error=None):
+        self.jobs.update_one(
+            {'_id': ObjectId(job_id), 'status': 'running'},
+            {'$set': {'status': 'failed' if error else 'done',
+                      'result_key': result_key,
+                      'error': error,
+                      'finished_at': datetime.utcnow()},  # BSON date, required by the TTL index
+             '$unset': {'active': ''}}
+        )
+
+    def requeue_stale_jobs(self, started_before, max_attempts):
+        stale = {'status': 'running', 'started_at': {'$lt': started_before}}
+        failed = self.jobs.update_many(
+            dict(stale, attempts={'$gte': max_attempts}),
+            {'$set': {'status': 'failed', 'error': 'Job timed out',
+                      'finished_at': datetime.utcnow()},
+             '$unset': {'active': ''}}
+        ).modified_count
+        requeued = self.jobs.update_many(stale, {'$set': {'status': 'queued'}}).modified_count
+        return {'requeued': requeued, 'failed': failed}
+
+    def get_statement(self, cache_key):
+        return self.statements.find_one({'_id': cache_key})
+
+    def save_statement(self, cache_key, statement):
+        # BSON date, required by the TTL index
+        statement = dict(statement, _id=cache_key, created_at=datetime.utcnow())
+        self.statements.replace_one({'_id': cache_key}, statement, upsert=True)
+        return statement
+
+    def statement_formats(self, cache_key):
+        # Only flags are returned; the blobs stay on the server
+        pipeline = [
+            {'$match': {'_id': cache_key}},
+            {'$project': {blob: {'$gt': [f'${blob}', None]} for blob in STATEMENT_BLOBS}}
+        ]
+        for flags in self.statements.aggregate(pipeline):
+            return [blob for blob in STATEMENT_BLOBS if flags.get(blob)]
+        return []
+
+    def get_user_by_username(self, username):
+        return self.users.find_one({'username': username})
+
+    def create_user(self, user_data):
+        user_data['created_at'] = datetime.now().isoformat()
+        self.users.insert_one(user_data)
+        return user_data
+
+
+class SQLiteRepository(Repository):
+    """Embedded SQLite repository for single-node deployments and tests.
+
+    Each thread gets its own connection; WAL mode lets readers proceed
+    while a write is in progress. Writes run in BEGIN IMMEDIATE
+    transactions, so the change sequence and the row change commit
+    together.
+    """
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS monthly_budgets (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            month TEXT NOT NULL,
+            created_at TEXT,
+            updated_at TEXT,
+            change_seq INTEGER NOT NULL DEFAULT 0
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_budgets_user_month ON monthly_budgets (user_id, month)",
+        "CREATE INDEX IF NOT EXISTS idx_budgets_user_seq ON monthly_budgets (user_id, change_seq)",
+        """CREATE TABLE IF NOT EXISTS daily_expenses (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            created_at TEXT,
+            updated_at TEXT,
+            change_seq INTEGER NOT NULL DEFAULT 0
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON daily_expenses (user_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_category_date ON daily_expenses (user_id, category, date)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_amount ON daily_expenses (user_id, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_user_seq ON daily_expenses (user_id, change_seq)",
+        """CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL UNIQUE,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            created_at TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS sync_counters (
+            user_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS sync_tombstones (
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            change_seq INTEGER NOT NULL,
+            deleted_at REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_tombstones_user_seq ON sync_tombstones (user_id, change_seq)",
+        "CREATE INDEX IF NOT EXISTS idx_tombstones_deleted_at ON sync_tombstones (deleted_at)",
+        # One archive bucket per user and month; the column arrays are stored as JSON
+        """CREATE TABLE IF NOT EXISTS expense_archive (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total REAL NOT NULL,
+            category_totals TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            archived_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, month)
+        )""",
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result_key TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_user_kind_status ON jobs (user_id, kind, status)",
+        """CREATE TABLE IF NOT EXISTS statements (
+            cache_key TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            csv TEXT NOT NULL,
+            html TEXT NOT NULL,
+            pdf BLOB,
+            created_at TEXT NOT NULL
+        )""",
+    ]
+
+    # Full-text index over descriptions, kept in sync by triggers
+    SEARCH_SCHEMA = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS expense_search USING fts5(
+            description, content='daily_expenses', content_rowid='rowid',
+            tokenize='porter unicode61'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS expense_search_insert AFTER INSERT ON daily_expenses BEGIN
+            INSERT INTO expense_search (rowid, description) VALUES (new.rowid, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS expense_search_delete AFTER DELETE ON daily_expenses BEGIN
+            INSERT INTO expense_search (expense_search, rowid, description) VALUES ('delete', old.rowid, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS expense_search_update AFTER UPDATE OF description ON daily_expenses BEGIN
+            INSERT INTO expense_search (expense_search, rowid, description) VALUES ('delete', old.rowid, old.description);
+            INSERT INTO expense_search (rowid, description) VALUES (new.rowid, new.description);
+        END""",
+    ]
+
+    BUDGET_COLUMNS = ('category', 'amount', 'month')
+    EXPENSE_COLUMNS = ('description', 'category', 'amount', 'date')
+
+    def __init__(self, path, tombstone_retention_days=30, statement_retention_days=7):
+        self.path = path
+        self.tombstone_retention_days = tombstone_retention_days
+        self.statement_retention_days = statement_retention_days
+        self.full_text_search = True
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: transactions are managed explicitly in _write()
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _to_document(row):
+        document = {key: row[key] for key in row.keys() if row[key] is not None}
+        document['_id'] = document.pop('id')
+        return document
+
+    def ensure_indexes(self, timeout=None):
+        with self._write() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+        try:
+            with self._write() as conn:
+                for statement in self.SEARCH_SCHEMA:
+                    conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: fall back to substring matching
+            logger.warning(f"SQLite full-text search unavailable, using LIKE: {str(e)}")
+            self.full_text_search = False
+
+    def ping(self, timeout=2):
+        self._connection().execute("SELECT 1").fetchone()
+
+    def _next_change_seq(self, conn, user_id):
+        conn.execute(
+            "INSERT INTO sync_counters (user_id, seq) VALUES (?, 1) "
+            "ON CONFLICT (user_id) DO UPDATE SET seq = seq + 1",
+            (user_id,))
+        return conn.execute("SELECT seq FROM sync_counters WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def _record_tombstone(self, conn, user_id, kind, item_id):
+        now = time.time()
+        conn.execute(
+            "INSERT INTO sync_tombstones (user_id, kind, item_id, change_seq, deleted_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, kind, item_id, self._next_change_seq(conn, user_id), now))
+        conn.execute("DELETE FROM sync_tombstones WHERE deleted_at < ?",
+                     (now - self.tombstone_retention_days * 86400,))
+
+    def _insert(self, table, columns, user_id, data):
+        with self._write() as conn:
+            data['user_id'] = user_id
+            data['created_at'] = datetime.now().isoformat()
+            data['change_seq'] = self._next_change_seq(conn, user_id)
+            data['_id'] = str(ObjectId())
+            names = ('id', 'user_id') + columns + ('created_at', 'change_seq')
+            values = [data['_id'], user_id] + [data[c] for c in columns] + [data['created_at'], data['change_seq']]
+            conn.execute(
+                f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                values)
+        return data
+
+    def _update(self, table, columns, user_id, item_id, fields):
+        with self._write() as conn:
+            fields = {c: fields[c] for c in columns if c in fields}
+            fields['updated_at'] = datetime.now().isoformat()
+            fields['change_seq'] = self._next_change_seq(conn, user_id)
+            assignments = ', '.join(f"{c} = ?" for c in fields)
+            cursor = conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = ? AND user_id = ?",
+                list(fields.values()) + [item_id, user_id])
+            if cursor.rowcount == 0:
+                # Undo the sequence allocation as well
+                raise _NotFound()
+            row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (item_id,)).fetchone()
+        return self._to_document(row)
+
+    def _delete(self, table, kind, user_id, item_id):
+        with self._write() as conn:
+            cursor = conn.execute(f"DELETE FROM {table} WHERE id = ? AND user_id = ?", (item_id, user_id))
+            if cursor.rowcount == 0:
+                return False
+            self._record_tombstone(conn, user_id, kind, item_id)
+        return True
+
+    def list_budgets(self, user_id, month=None):
+        sql = "SELECT * FROM monthly_budgets WHERE user_id = ?"
+        params = [user_id]
+        if month:
+            sql += " AND month = ?"
+            params.append(month)
+        return [self._to_document(row) for row in self._connection().execute(sql, params)]
+
+    def create_budget(self, user_id, budget_data):
+        return self._insert('monthly_budgets', self.BUDGET_COLUMNS, user_id, budget_data)
+
+    def update_budget(self, user_id, budget_id, fields):
+        try:
+            return self._update('monthly_budgets', self.BUDGET_COLUMNS, user_id, budget_id, fields)
+        except _NotFound:
+            return None
+
+    def delete_budget(self, user_id, budget_id):
+        return self._delete('monthly_budgets', 'budget', user_id, budget_id)
+
+    def expense_where(self, user_id, filters):
+        """Translate neutral expense filters into a WHERE clause and parameters"""
+        clauses = ["user_id = ?"]
+        params = [user_id]
+        filters = filters or {}
+        if filters.get('date_from'):
+            clauses.append("date >= ?")
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            clauses.append("date <= ?")
+            params.append(filters['date_to'])
+        categories = filters.get('categories')
+        if categories:
+            clauses.append(f"category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        if filters.get('min_amount') is not None:
+            clauses.append("amount >= ?")
+            params.append(filters['min_amount'])
+        if filters.get('max_amount') is not None:
+            clauses.append("amount <= ?")
+            params.append(filters['max_amount'])
+        terms = (filters.get('search') or '').split()
+        if terms and self.full_text_search:
+            # Like MongoDB $text: any of the (stemmed) terms matches
+            clauses.append("rowid IN (SELECT rowid FROM expense_search WHERE expense_search MATCH ?)")
+            params.append(' OR '.join('"' + term.replace('"', '""') + '"' for term in terms))
+        elif terms:
+            clauses.append('(' + ' OR '.join("description LIKE ?" for _ in terms) + ')')
+            params.extend(f"%{term}%" for term in terms)
+        return ' AND '.join(clauses), params
+
+    def list_expenses(self, user_id, filters=None):
+        where, params = self.expense_where(user_id, filters)
+        rows = self._connection().execute(f"SELECT * FROM daily_expenses WHERE {where}", params)
+        return self._archived_expenses(user_id, filters) + [self._to_document(row) for row in rows]
+
+    @staticmethod
+    def _to_bucket(row):
+        bucket = json.loads(row['columns'])
+        bucket.update({
+            'user_id': row['user_id'],
+            'month': row['month'],
+            'count': row['count'],
+            'total': row['total'],
+            'category_totals': json.loads(row['category_totals'])
+        })
+        return bucket
+
+    def _archived_expenses(self, user_id, filters):
+        sql = "SELECT * FROM expense_archive WHERE user_id = ?"
+        params = [user_id]
+        first_month, last_month = archive_month_range(filters)
+        if first_month:
+            sql += " AND month >= ?"
+            params.append(first_month)
+        if last_month:
+            sql += " AND month <= ?"
+            params.append(last_month)
+        rows = []
+        for row in self._connection().execute(sql + " ORDER BY month", params):
+            rows.extend(unpack_bucket(self._to_bucket(row), filters))
+        return rows
+
+    def archive_expenses(self, before_month):
+        cutoff = f'{before_month}-01'
+        stats = {'users': 0, 'buckets': 0, 'expenses': 0}
+        user_ids = [row[0] for row in self._connection().execute("SELECT DISTINCT user_id FROM daily_expenses")]
+        for user_id in user_ids:
+            # One transaction per user: buckets and deletions commit together
+            with self._write() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM daily_expenses WHERE user_id = ? AND date < ? ORDER BY date",
+                    (user_id, cutoff)).fetchall()
+                for month, expenses in groupby((self._to_document(r) for r in rows),
+                                               key=lambda expense: expense['date'][:7]):
+                    expenses = list(expenses)
+                    existing = conn.execute(
+                        "SELECT * FROM expense_archive WHERE user_id = ? AND month = ?",
+                        (user_id, month)).fetchone()
+                    bucket = pack_expenses(expenses, self._to_bucket(existing) if existing else None)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO expense_archive "
+                        "(user_id, month, count, total, category_totals, columns, archived_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (user_id, month, bucket['count'], bucket['total'],
+                         json.dumps(bucket['category_totals']),
+                         json.dumps({column: bucket[column] for column in ARCHIVE_COLUMNS}),
+                         datetime.now().isoformat()))
+                    conn.executemany("DELETE FROM daily_expenses WHERE id = ?", [(e['_id'],) for e in expenses])
+                    # Delta sync clients still hold editable copies of these expenses
+                    self._record_tombstone(conn, user_id, 'archive', month)
+                    stats['buckets'] += 1
+                    stats['expenses'] += len(expenses)
+                stats['users'] += bool(rows)
+        return stats
+
+    def expense_user_ids(self, after_user_id=None, limit=1000):
+        rows = self._connection().execute(
+            "SELECT user_id FROM daily_expenses WHERE user_id > ? "
+            "UNION SELECT user_id FROM expense_archive WHERE user_id > ? "
+            "ORDER BY user_id LIMIT ?",
+            (after_user_id if after_user_id is not None else -2**63,) * 2 + (limit,))
+        return [row[0] for row in rows]
+
+    def expense_columns(self, user_ids):
+        columns = empty_expense_columns()
+        user_ids = list(user_ids)
+        if not user_ids:
+            return columns
+        conn = self._connection()
+        placeholders = ', '.join('?' * len(user_ids))
+        rows = conn.execute(
+            f"SELECT id, date, amount, category, description, user_id FROM daily_expenses "
+            f"WHERE user_id IN ({placeholders})", user_ids).fetchall()
+        if rows:
+            # Transpose rows into columns without a per-row loop in Python code
+            for column, values in zip(list(ARCHIVE_COLUMNS) + ['user_ids'], zip(*rows)):
+                columns[column].extend(values)
+        for row in conn.execute(f"SELECT * FROM expense_archive WHERE user_id IN ({placeholders})", user_ids):
+            append_expense_columns(columns, row['user_id'], self._to_bucket(row))
+        return columns
+
+    def create_expense(self, user_id, expense_data):
+        return self._insert('daily_expenses', self.EXPENSE_COLUMNS, user_id, expense_data)
+
+    def update_expense(self, user_id, expense_id, fields):
+        try:
+            return self._update('daily_expenses', self.EXPENSE_COLUMNS, user_id, expense_id, fields)
+        except _NotFound:
+            return None
+
+    def delete_expense(self, user_id, expense_id):
+        return self._delete('daily_expenses', 'expense', user_id, expense_id)
+
+    def current_change_seq(self, user_id):
+        row = self._connection().execute(
+            "SELECT seq FROM sync_counters WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, user_id, since_seq):
+        conn = self._connection()
+        params = (user_id, since_seq)
+        budgets = [self._to_document(row) for row in conn.execute(
+            "SELECT * FROM monthly_budgets WHERE user_id = ? AND change_seq > ?", params)]
+        expenses = [self._to_document(row) for row in conn.execute(
+            "SELECT * FROM daily_expenses WHERE user_id = ? AND change_seq > ?", params)]
+        tombstones = [dict(row) for row in conn.execute(
+            "SELECT kind, item_id, change_seq FROM sync_tombstones WHERE user_id = ? AND change_seq > ?", params)]
+        return budgets, expenses, tombstones
+
+    @classmethod
+    def _to_job(cls, row):
+        job = cls._to_document(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def enqueue_job(self, user_id, kind, params):
+        encoded = json.dumps(params, sort_keys=True)
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE user_id = ? AND kind = ? AND params = ? "
+                "AND status IN ('queued', 'running')",
+                (user_id, kind, encoded)).fetchone()
+            if row:
+                return self._to_job(row)
+            job = {
+                '_id': str(ObjectId()),
+                'user_id': user_id,
+                'kind': kind,
+                'params': params,
+                'status': 'queued',
+                'attempts': 0,
+                'created_at': datetime.now().isoformat()
+            }
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, kind, params, status, attempts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job['_id'], user_id, kind, encoded, job['status'], job['attempts'], job['created_at']))
+        return job
+
+    def get_job(self, user_id, job_id):
+        row = self._connection().execute(
+            "SELECT * FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)).fetchone()
+        return self._to_job(row) if row else None
+
+    def claim_job(self):
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (datetime.now().isoformat(), row['id']))
+            return self._to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone())
+
+    def finish_job(self, job_id, result_key=None, error=None):
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result_key = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                ('failed' if error else 'done', result_key, error, datetime.now().isoformat(), job_id))
+            self._purge_expired(conn)
+
+    def requeue_stale_jobs(self, started_before, max_attempts):
+        with self._write() as conn:
+            failed = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Job timed out', finished_at = ? "
+                "WHERE status = 'running' AND started_at < ? AND attempts >= ?",
+                (datetime.now().isoformat(), started_before, max_attempts)).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND started_at < ?",
+                (started_before,)).rowcount
+        return {'requeued': requeued, 'failed': failed}
+
+    def get_statement(self, cache_key):
+        row = self._connection().execute(
+            "SELECT * FROM statements WHERE cache_key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        statement = {key: row[key] for key in row.keys()}
+        statement['_id'] = statement.pop('cache_key')
+        return statement
+
+    def save_statement(self, cache_key, statement):
+        statement = dict(statement, _id=cache_key, created_at=datetime.now().isoformat())
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO statements (cache_key, user_id, month, csv, html, pdf, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, statement['user_id'], statement['month'], statement['csv'],
+                 statement['html'], statement.get('pdf'), statement['created_at']))
+            self._purge_expired(conn)
+        return statement
+
+    def statement_formats(self, cache_key):
+        row = self._connection().execute(
+            "SELECT " + ", ".join(f"{blob} IS NOT NULL AND length({blob}) > 0" for blob in STATEMENT_BLOBS) +
+            " FROM statements WHERE cache_key = ?", (cache_key,)).fetchone()
+        return [blob for blob, present in zip(STATEMENT_BLOBS, row or ()) if present]
+
+    def _purge_expired(self, conn):
+        # Statements and finished jobs past their retention, like the MongoDB TTL indexes
+        cutoff = (datetime.now() - timedelta(days=self.statement_retention_days)).isoformat()
+        conn.execute("DELETE FROM statements WHERE created_at < ?", (cutoff,))
+        conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+    def get_user_by_username(self, username):
+        row = self._connection().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return self._to_document(row) if row else None
+
+    def create_user(self, user_data):
+        user_data['created_at'] = datetime.now().isoformat()
+        user_data['_id'] = str(ObjectId())
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO users (id, user_id, username, password, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_data['_id'], user_data['user_id'], user_data['username'],
+                 user_data['password'], user_data['created_at']))
+        return user_data
+
+
+class _NotFound(Exception):
+    """Raised inside a write transaction to roll it back when no row matched"""
+
+
+def create_repository(backend, mongo_uri=None, sqlite_path=None, read_preference=None,
+                      use_primary=None, tombstone_retention_days=30, statement_retention_days=7):
+    """Build the repository for STORAGE_BACKEND ('mongo' or 'sqlite')"""
+    if backend == 'sqlite':
+        return SQLiteRepository(sqlite_path, tombstone_retention_days=tombstone_retention_days,
+                                statement_retention_days=statement_retention_days)
+    if backend != 'mongo':
+        raise ValueError(f"Unknown storage backend '{backend}'")
+    client = MongoClient(mongo_uri)
+    return MongoRepository(client.budget_planner,
+                           read_preference=read_preference,
+                           use_primary=use_primary,
+                           tombstone_retention_days=tombstone_retention_days,
+                           statement_retention_days=statement_retention_days)
@@ -0,0 +1,52 @@
+"""
+Tests for the adaptive concurrency limiter
+Run from budget_service/: python -m pytest test_admission.py
+"""
+
+import unittest
+
+from admission import AdaptiveLimiter
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+
+    def run_requests(self, limiter, latencies):
+        for latency in latencies:
+            self.assertTrue(limiter.try_acquire('normal'))
+            limiter.release(latency)
+
+    def test_release_with_zero_latency(self):
+        # A coarse monotonic clock reports fast requests as taking no time at all
+        limiter = AdaptiveLimiter(initial_limit=16)
+        self.run_requests(limiter, [0.0, 0.0, 0.0])
+        snapshot = limiter.snapshot()
+        self.assertEqual(snapshot['in_flight'], 0)
+        self.assertGreaterEqual(snapshot['limit'], limiter.min_limit)
+
+    def test_release_with_zero_then_real_latency(self):
+        limiter = AdaptiveLimiter(initial_limit=16)
+        self.run_requests(limiter, [0.0, 0.02, 0.0, 0.02])
+        self.assertEqual(limiter.snapshot()['in_flight'], 0)
+
+    def test_release_with_equal_latencies(self):
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=8)
+        for _ in range(50):
+            # Keep the limit in use so it may grow
+            for _ in range(4):
+                limiter.try_acquire('critical')
+            for _ in range(4):
+                limiter.release(0.01)
+        self.assertEqual(limiter.snapshot()['limit'], 8)
+
+    def test_capacity_bounds_admission(self):
+        capacity = [3]
+        limiter = AdaptiveLimiter(initial_limit=16, capacity=lambda: capacity[0])
+        admitted = [limiter.try_acquire('critical') for _ in range(5)]
+        self.assertEqual(admitted, [True, True, True, False, False])
+        capacity[0] = 0
+        limiter.release(0.01)
+        self.assertFalse(limiter.try_acquire('critical'))
+
+
+if __name__ == '__main__':
+    unittest.main()
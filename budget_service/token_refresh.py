@@ -0,0 +1,82 @@
+"""
+Token Refresh - Coalesced access-token refreshes through auth_service's /refresh
+One refresh call per refresh token and process, however many requests need it at once
+"""
+
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidRefreshToken(Exception):
+    """The auth service rejected the refresh token (expired or invalid)"""
+
+
+class TokenRefresher:
+    """Coalesces concurrent refreshes of the same refresh token within this process.
+
+    The first request that needs a refresh calls `refresh_call`; concurrent
+    requests with the same refresh token wait for that call and share its
+    outcome. Outcomes are remembered for `result_ttl` seconds, so requests
+    still carrying the old session cookie reuse the new token, and while
+    the auth service is unreachable each token is retried at most that often.
+    """
+
+    def __init__(self, refresh_call, result_ttl=30, wait_timeout=10):
+        self._refresh_call = refresh_call
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._outcomes = {}
+
+    def refresh(self, refresh_token):
+        """Return (access_token, expires_at), or None if the auth service is unavailable.
+
+        Raises InvalidRefreshToken when the refresh token was rejected.
+        """
+        with self._lock:
+            self._prune()
+            outcome = self._outcomes.get(refresh_token)
+            if outcome is None:
+                done = self._in_flight.get(refresh_token)
+                leader = done is None
+                if leader:
+                    done = self._in_flight[refresh_token] = threading.Event()
+        if outcome is not None:
+            return self._unwrap(outcome)
+
+        if not leader:
+            done.wait(self.wait_timeout)
+            with self._lock:
+                outcome = self._outcomes.get(refresh_token)
+            # The leader's call is taking too long; carry on with the current token
+            return self._unwrap(outcome) if outcome is not None else None
+
+        result = error = None
+        try:
+            result = self._refresh_call(refresh_token)
+        except InvalidRefreshToken as e:
+            error = e
+        except Exception as e:
+            logger.warning(f"Token refresh failed, keeping the current token: {str(e)}")
+        outcome = (time.monotonic() + self.result_ttl, result, error)
+        with self._lock:
+            self._outcomes[refresh_token] = outcome
+            del self._in_flight[refresh_token]
+        done.set()
+        return self._unwrap(outcome)
+
+    def _prune(self):
+        now = time.monotonic()
+        for refresh_token in [token for token, outcome in self._outcomes.items() if outcome[0] <= now]:
+            del self._outcomes[refresh_token]
+
+    @staticmethod
+    def _unwrap(outcome):
+        _, result, error = outcome
+        if error is not None:
+            raise error
+        return result
@@ -0,0 +1,4 @@
+"""
+Common - Modules shared by the budget and auth services (readiness, tracing, profiling)
+Both Dockerfiles copy this package next to the service's app.py
+"""
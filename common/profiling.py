@@ -0,0 +1,165 @@
+"""
+Profiling - On-demand sampling profiler for individual requests
+Writes folded stacks (flamegraph.pl / speedscope compatible) per profiled request
+
+A request is profiled when it carries a valid X-Profile-Token header, or at
+random with probability PROFILING_SAMPLE_RATE. Tokens are signed with
+PROFILING_SECRET and expire; create one with:
+
+    PROFILING_SECRET=... python -m common.profiling --ttl 600
+"""
+
+from collections import Counter
+import argparse
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import logging
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILING_SECRET = os.getenv('PROFILING_SECRET', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/profiles')
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '5'))
+# Retention: only the newest profiles are kept
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '200'))
+# Stops sampling runaway requests (60 s at the default interval)
+PROFILING_MAX_SAMPLES = int(os.getenv('PROFILING_MAX_SAMPLES', '12000'))
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+_prune_lock = threading.Lock()
+
+
+def sign_token(expires_at, secret=None):
+    """Token authorizing profiling until the given Unix time"""
+    secret = secret or PROFILING_SECRET
+    signature = hmac.new(secret.encode(), str(int(expires_at)).encode(), hashlib.sha256).hexdigest()
+    return f"{int(expires_at)}.{signature}"
+
+
+def token_is_valid(token):
+    if not PROFILING_SECRET or not token or '.' not in token:
+        return False
+    expires_at, _ = token.split('.', 1)
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(token, sign_token(int(expires_at)))
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's call stack at a fixed interval from a helper thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and self.samples < PROFILING_MAX_SAMPLES:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Folded stack lines: 'root;...;leaf count'"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest `keep` profiles"""
+    with _prune_lock:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.folded')]
+        if len(paths) <= keep:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - keep]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def init_profiling(app, service_name, excluded_endpoints=()):
+    """Register request hooks; a no-op unless a secret or a sample rate is configured"""
+    if not PROFILING_SECRET and PROFILING_SAMPLE_RATE <= 0:
+        return False
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+
+    @app.before_request
+    def start_profiling():
+        if request.endpoint in excluded_endpoints:
+            return None
+        if not (token_is_valid(request.headers.get(PROFILE_HEADER))
+                or random.random() < PROFILING_SAMPLE_RATE):
+            return None
+        g.profile_id = uuid.uuid4().hex[:12]
+        g.profile_started = time.perf_counter()
+        g.profiler = StackSampler(threading.get_ident(), PROFILING_INTERVAL_MS / 1000)
+        g.profiler.start()
+        return None
+
+    @app.after_request
+    def tag_profiled_response(response):
+        if g.get('profiler') is not None:
+            response.headers['X-Profile-Id'] = g.profile_id
+        return response
+
+    @app.teardown_request
+    def finish_profiling(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.stop()
+        duration_ms = (time.perf_counter() - g.profile_started) * 1000
+        endpoint = request.endpoint or 'unknown'
+        filename = (f"{time.strftime('%Y%m%dT%H%M%S')}-{service_name}-{endpoint}-"
+                    f"{duration_ms:.0f}ms-{g.profile_id}.folded")
+        try:
+            with open(os.path.join(PROFILING_DIR, filename), 'w') as output:
+                output.write(profiler.folded())
+            prune_profiles(PROFILING_DIR, PROFILING_MAX_FILES)
+            logger.info(f"Profiled {request.method} {request.path} ({duration_ms:.0f} ms, "
+                        f"{profiler.samples} samples): {filename}")
+        except OSError as e:
+            logger.error(f"Failed to write profile: {str(e)}")
+
+    logger.info(f"Request profiling enabled for {service_name} (sample rate {PROFILING_SAMPLE_RATE})")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create a signed, expiring profiling token')
+    parser.add_argument('--ttl', type=int, default=600, help='seconds until the token expires (default 600)')
+    args = parser.parse_args()
+    if not PROFILING_SECRET:
+        parser.error('PROFILING_SECRET must be set')
+    print(sign_token(time.time() + args.ttl))
@@ -0,0 +1,91 @@
+"""
+Readiness - Dependency checks refreshed in the background
+Readiness probes only read the cached results, so they never add load to MongoDB or other services
+"""
+
+from datetime import datetime
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyMonitor:
+    """Runs dependency checks every `interval` seconds on a daemon thread.
+
+    A check is a callable that raises on failure. The process is ready
+    once warm-up has finished and every required check passed recently;
+    results older than `max_age_intervals` intervals count as failed, so a
+    stuck monitor thread also makes the process unready.
+    """
+
+    def __init__(self, interval=5, max_age_intervals=3):
+        self.interval = interval
+        self.max_age = interval * max_age_intervals
+        self.warmed_up = False
+        self._checks = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_check(self, name, check, required=True):
+        self._checks[name] = (check, required)
+
+    def refresh(self):
+        """Run every check once and cache the results"""
+        for name, (check, required) in self._checks.items():
+            start = time.monotonic()
+            try:
+                check()
+                error = None
+            except Exception as e:
+                error = str(e)
+            previous = self._results.get(name)
+            # Log state changes only, not every failed round
+            if error and (previous is None or previous['ok']):
+                logger.warning(f"Dependency check '{name}' failed: {error}")
+            elif not error and previous is not None and not previous['ok']:
+                logger.info(f"Dependency check '{name}' recovered")
+            result = {
+                'ok': error is None,
+                'required': required,
+                'latency_ms': round((time.monotonic() - start) * 1000, 2),
+                'error': error,
+                'checked_at': datetime.now().isoformat(),
+                'checked_monotonic': time.monotonic()
+            }
+            with self._lock:
+                self._results[name] = result
+
+    def start(self):
+        """Start refreshing in the background (once per process)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dependency-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Dependency monitor error: {str(e)}")
+
+    def status(self):
+        """Return (ready, details) from the cached results"""
+        now = time.monotonic()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        ready = self.warmed_up
+        for name, (check, required) in self._checks.items():
+            result = results.get(name)
+            if result is None:
+                ready = ready and not required
+                continue
+            if now - result.pop('checked_monotonic') > self.max_age:
+                result['ok'] = False
+                result['error'] = 'Check result is stale'
+            if required and not result['ok']:
+                ready = False
+        return ready, {'warmed_up': self.warmed_up, 'checks': results}
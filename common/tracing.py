@@ -0,0 +1,95 @@
+"""
+Tracing - Optional OpenTelemetry setup for Flask handlers, outgoing HTTP calls and MongoDB commands
+Off unless TRACING_EXPORTER is 'file' or 'otlp'; a no-op when OpenTelemetry isn't installed
+"""
+
+from contextlib import contextmanager
+import os
+import threading
+import logging
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+except ImportError:  # pragma: no cover - tracing is optional
+    trace = None
+    SpanExporter = object
+
+logger = logging.getLogger(__name__)
+
+# 'none', 'file' (JSON lines) or 'otlp' (OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT, e.g. a local collector)
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none')
+TRACING_FILE = os.getenv('TRACING_FILE', 'traces.jsonl')
+# Probe and monitoring requests would drown out everything else
+TRACING_EXCLUDED_URLS = os.getenv('TRACING_EXCLUDED_URLS', 'health,metrics')
+
+tracer = None
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON document per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = ''.join(span.to_json(indent=None) + '\n' for span in spans)
+        with self._lock, open(self.path, 'a') as output:
+            output.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def build_exporter():
+    if TRACING_EXPORTER == 'file':
+        return JsonLinesSpanExporter(TRACING_FILE)
+    if TRACING_EXPORTER == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER '{TRACING_EXPORTER}'")
+
+
+def init_tracing(app, service_name):
+    """Instrument the app, outgoing requests and pymongo; call before any MongoClient is created"""
+    global tracer
+    if TRACING_EXPORTER == 'none':
+        return False
+    if trace is None:
+        logger.warning("TRACING_EXPORTER is set but OpenTelemetry is not installed; tracing disabled")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+    provider.add_span_processor(BatchSpanProcessor(build_exporter()))
+    trace.set_tracer_provider(provider)
+    tracer = trace.get_tracer(service_name)
+
+    # Server spans continue the caller's trace from the incoming traceparent header
+    from opentelemetry.instrumentation.flask import FlaskInstrumentor
+    FlaskInstrumentor().instrument_app(app, excluded_urls=TRACING_EXCLUDED_URLS)
+    # Command listeners only attach to clients created after this
+    from opentelemetry.instrumentation.pymongo import PymongoInstrumentor
+    PymongoInstrumentor().instrument()
+    try:
+        # Outgoing calls carry the trace context to the next service
+        from opentelemetry.instrumentation.requests import RequestsInstrumentor
+        RequestsInstrumentor().instrument()
+    except ImportError:
+        pass
+
+    logger.info(f"Tracing enabled for {service_name} ({TRACING_EXPORTER} exporter)")
+    return True
+
+
+@contextmanager
+def span(name, **attributes):
+    """Manual span around a block of work; does nothing when tracing is off"""
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
@@ -13,6 +13,9 @@ db.createCollection('daily_expenses');
 db.users.createIndex({ "username": 1 }, { unique: true });
 db.monthly_budgets.createIndex({ "user_id": 1, "month": 1 });
 db.daily_expenses.createIndex({ "user_id": 1, "date": 1 });
+db.daily_expenses.createIndex({ "user_id": 1, "category": 1, "date": 1 });
+db.daily_expenses.createIndex({ "user_id": 1, "amount": 1 });
+db.daily_expenses.createIndex({ "user_id": 1, "description": "text" });
 
 // Insert sample data (optional)
 db.users.insertOne({